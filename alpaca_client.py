@@ -4,16 +4,31 @@ Alpaca client wrapper.
 - Uses APCA_API_KEY_1 / APCA_API_SECRET_1 (GitHub Secrets) or falls back to legacy env names.
 - Defaults to PAPER mode unless MODE env or config.json requests otherwise.
 - Does NOT pass unsupported 'base_url' kwarg to TradingClient.
-- Includes retry wrapper for orders.
+- Includes retry wrapper for orders (transient errors and 429/5xx only, adaptive backoff).
+- Builds the Alpaca clients lazily on first use and shares one pooled keep-alive requests.Session between them.
+- Caches latest quotes briefly to avoid repeat round-trips within a scan.
+- Provides async variants (run in worker threads) so callers can fan out requests with asyncio.gather.
 """
+import asyncio
+import functools
 import os
-import json
 import logging
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, stop_after_attempt, retry_if_exception, before_sleep_log
 
+from alpaca.common.exceptions import APIError
 from alpaca.trading.client import TradingClient
+from alpaca.trading.enums import OrderClass, OrderSide, OrderStatus, TimeInForce
+from alpaca.trading.requests import LimitOrderRequest, TakeProfitRequest, StopLossRequest
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.data.requests import StockLatestQuoteRequest
+from utils import load_config
 
 logger = logging.getLogger(__name__)
 
@@ -29,117 +44,303 @@ CONFIG_PATH = os.path.join(os.getcwd(), "config.json")
 _config_mode = None
 try:
     if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "r") as f:
-            cfg = json.load(f)
-            _config_mode = cfg.get("MODE", None)
+        _config_mode = load_config(CONFIG_PATH).get("MODE", None)
 except Exception as e:
     logger.warning("Could not load config.json to determine MODE: %s", e)
 
 # Decide whether to use paper True/False
-# Priority: ENV_MODE -> config.json MODE -> guess from APCA_BASE_URL_1 (paper in url) -> default PAPER
-def _is_paper_mode():
-    if ENV_MODE:
-        return str(ENV_MODE).strip().upper() == "PAPER"
-    if _config_mode:
-        return str(_config_mode).strip().upper() == "PAPER"
-    if API_BASE_CANDIDATE and "paper" in API_BASE_CANDIDATE.lower():
-        return True
-    return True  # default to PAPER for safety
-
-PAPER_MODE = _is_paper_mode()
+# Priority: ENV_MODE -> config.json MODE -> default PAPER. A "paper" APCA_BASE_URL_1 can only
+# confirm the PAPER default, so it does not need checking; a live URL never enables LIVE by itself.
+PAPER_MODE = str(ENV_MODE or _config_mode or "PAPER").strip().upper() == "PAPER"
 
 if not API_KEY or not API_SECRET:
     logger.warning(
         "Alpaca API key/secret not set. Provide APCA_API_KEY_1 & APCA_API_SECRET_1 (GitHub Secrets) or ALPACA_API_KEY_ID & ALPACA_API_SECRET_KEY locally."
     )
 
-trading_client = None
-historical_data_client = None
+# One keep-alive connection pool shared by every Alpaca REST call. The async variants run on
+# a worker pool of the same size, so concurrent requests never outnumber pooled connections.
+MAX_CONCURRENT_REQUESTS = 16
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = MAX_CONCURRENT_REQUESTS
 
-try:
-    # TradingClient signature does not accept base_url; use paper flag.
-    trading_client = TradingClient(API_KEY, API_SECRET, paper=PAPER_MODE)
-    historical_data_client = StockHistoricalDataClient(API_KEY, API_SECRET)
-    logger.info("Initialized Alpaca clients (paper=%s)", PAPER_MODE)
-except TypeError as e:
-    # Defensive fallback if TradingClient signature differs; re-raise after logging
-    logger.exception("TradingClient initialization TypeError: %s", e)
-    raise
-except Exception as e:
-    logger.exception("Failed to initialize Alpaca clients: %s", e)
-    trading_client = None
-    historical_data_client = None
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0))
+http_session.headers["Connection"] = "keep-alive"
+
+def _use_shared_session(client):
+    # alpaca-py's RESTClient keeps its requests.Session in the private _session attribute
+    if not hasattr(client, "_session"):
+        logger.warning("%s has no _session attribute; using its own connection pool.", type(client).__name__)
+        return
+    client._session = http_session
+    # RESTClient also retries 429/504 itself with fixed sleeps; turn that off so _call_with_retry
+    # is the only retry policy and AdaptiveBackoff sees every 429.
+    client._retry = 0
+
+# Clients are built lazily on first use and memoized, so importing this module makes no
+# network calls and every caller shares the same client (and connection pool).
+# A client that cannot be built (missing credentials, incompatible alpaca-py) is fatal:
+# the process exits instead of failing every call of every scan.
+@functools.lru_cache(maxsize=1)
+def _trading_client():
+    try:
+        # TradingClient signature does not accept base_url; use paper flag.
+        client = TradingClient(API_KEY, API_SECRET, paper=PAPER_MODE)
+    except Exception as e:
+        logger.exception("Failed to initialize Alpaca trading client: %s", e)
+        raise SystemExit(1) from e
+    _use_shared_session(client)
+    logger.info("Initialized Alpaca trading client (paper=%s)", PAPER_MODE)
+    return client
+
+@functools.lru_cache(maxsize=1)
+def _historical_data_client():
+    try:
+        client = StockHistoricalDataClient(API_KEY, API_SECRET)
+    except Exception as e:
+        logger.exception("Failed to initialize Alpaca data client: %s", e)
+        raise SystemExit(1) from e
+    _use_shared_session(client)
+    return client
 
 # Retry wrapper for transient network errors and rate-limits
-@retry(wait=wait_exponential(multiplier=0.5, min=1, max=10), stop=stop_after_attempt(5), retry=retry_if_exception_type(Exception))
+# Only transient failures are retried. Anything else (validation errors, auth failures,
+# insufficient funds and other 4xx) fails on the first attempt, and cancellation or
+# Ctrl-C is never retried so shutdown is not held up by backoff sleeps.
+TRANSIENT_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, ConnectionResetError)
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+NEVER_RETRY = (asyncio.CancelledError, KeyboardInterrupt, SystemExit)
+
+def _is_retryable(exc):
+    if isinstance(exc, NEVER_RETRY):
+        return False
+    if isinstance(exc, TRANSIENT_EXCEPTIONS):
+        return True
+    return isinstance(exc, APIError) and exc.status_code in RETRYABLE_STATUS_CODES
+
+class AdaptiveBackoff:
+    """
+    Exponential backoff with jitter, stretched by the share of recent calls that were
+    rate-limited (429). While Alpaca is throttling, first attempts are delayed too.
+    """
+    def __init__(self, base=1.0, cap=30.0, jitter=0.5, window=50):
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self.recent_429 = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, rate_limited):
+        with self._lock:
+            self.recent_429.append(bool(rate_limited))
+
+    def rate_of_429(self):
+        with self._lock:
+            return sum(self.recent_429) / len(self.recent_429) if self.recent_429 else 0.0
+
+    def next_delay(self, attempt):
+        delay = self.base * 2 ** attempt * (1 + self.rate_of_429())
+        return min(self.cap, delay + random.uniform(0, self.jitter))
+
+    def first_attempt_delay(self):
+        rate = self.rate_of_429()
+        return min(self.cap, self.base * rate) if rate else 0.0
+
+    def wait_fn(self, retry_state):
+        return self.next_delay(retry_state.attempt_number - 1)
+
+adaptive_backoff = AdaptiveBackoff()
+
+# Each retry logs a one-line warning; the final exception is re-raised for the caller to
+# log once with its traceback.
+@retry(wait=adaptive_backoff.wait_fn, stop=stop_after_attempt(3), retry=retry_if_exception(_is_retryable),
+       before_sleep=before_sleep_log(logger, logging.WARNING), reraise=True)
+def _call_with_retry(func, *args, **kwargs):
+    try:
+        result = func(*args, **kwargs)
+    except APIError as e:
+        adaptive_backoff.record(e.status_code == 429)
+        raise
+    adaptive_backoff.record(False)
+    return result
+
 def submit_order_safe(func, *args, **kwargs):
-    return func(*args, **kwargs)
+    delay = adaptive_backoff.first_attempt_delay()
+    if delay:
+        time.sleep(delay)
+    return _call_with_retry(func, *args, **kwargs)
 
 def get_account():
-    if trading_client is None:
-        raise RuntimeError("Trading client not initialized.")
-    return trading_client.get_account()
+    return _trading_client().get_account()
 
 def list_positions():
-    if trading_client is None:
-        return []
+    trading_client = _trading_client()
     try:
         return trading_client.get_all_positions()
     except Exception as e:
-        logger.exception("Error listing positions: %s", e)
+        logger.warning("Error listing positions: %s", e)
         return []
 
-def get_latest_quote(symbol: str):
-    if historical_data_client is None:
-        logger.debug("Historical data client not initialized.")
-        return None
+# Latest-quote cache: quotes younger than QUOTE_TTL_SECONDS are reused, older ones refetched.
+QUOTE_TTL_SECONDS = 1.0
+QUOTE_CACHE_MAXSIZE = 512
+_quote_cache = OrderedDict()  # symbol -> (quote, fetched_at)
+_quote_lock = threading.Lock()
+
+def _fetch_latest_quotes(symbols):
+    historical_data_client = _historical_data_client()
     try:
-        req = StockLatestQuoteRequest(symbol_or_symbols=symbol)
-        return historical_data_client.get_stock_latest_quote(req)
+        req = StockLatestQuoteRequest(symbol_or_symbols=list(symbols))
+        quotes = historical_data_client.get_stock_latest_quote(req)
     except Exception as e:
-        logger.exception("Error getting latest quote for %s: %s", symbol, e)
-        return None
+        logger.warning("Error getting latest quotes for %s: %s", ", ".join(symbols), e)
+        return {}
+    now = time.monotonic()
+    with _quote_lock:
+        for symbol, quote in quotes.items():
+            _quote_cache[symbol] = (quote, now)
+            _quote_cache.move_to_end(symbol)
+        while len(_quote_cache) > QUOTE_CACHE_MAXSIZE:
+            _quote_cache.popitem(last=False)
+    return quotes
 
-def place_limit_order(symbol, qty, side, limit_price, time_in_force="day", order_class=None, take_profit=None, stop_loss=None, client_order_id=None):
+def get_latest_quotes(symbols):
     """
-    Creates a Limit (or bracket) order using alpaca-py TradingClient. Uses retry wrapper.
+    Latest quotes for many symbols as {symbol: Quote}. Fresh cached quotes are reused;
+    all other symbols are fetched in a single request.
     """
-    if trading_client is None:
-        raise RuntimeError("Trading client not initialized.")
-    from alpaca.trading.requests import LimitOrderRequest, OrderSide, TimeInForce
-    side_obj = OrderSide.SELL if side.lower() == "sell" else OrderSide.BUY
-    req = LimitOrderRequest(
-        symbol=symbol,
-        qty=qty,
-        side=side_obj,
-        time_in_force=TimeInForce.DAY,
-        limit_price=str(limit_price)
-    )
+    now = time.monotonic()
+    quotes, missing = {}, []
+    with _quote_lock:
+        for symbol in symbols:
+            hit = _quote_cache.get(symbol)
+            if hit is not None and now - hit[1] < QUOTE_TTL_SECONDS:
+                quotes[symbol] = hit[0]
+            else:
+                missing.append(symbol)
+    if missing:
+        quotes.update(_fetch_latest_quotes(missing))
+    return quotes
+
+def get_latest_quote(symbol: str):
+    return get_latest_quotes([symbol]).get(symbol)
 
+_SIDE = {"buy": OrderSide.BUY, "sell": OrderSide.SELL}
+_TIF_DAY = TimeInForce.DAY
+
+def _limit_order_request(symbol, qty, side, limit_price, time_in_force="day", order_class=None, take_profit=None, stop_loss=None, client_order_id=None):
+    fields = {
+        "symbol": symbol,
+        "qty": qty,
+        "side": _SIDE[side.lower()],
+        "time_in_force": _TIF_DAY,
+        "limit_price": str(limit_price),
+        "client_order_id": client_order_id,
+    }
     if order_class == "bracket" and (take_profit is not None or stop_loss is not None):
-        # attach bracket objects
-        req.order_class = "bracket"
-        from alpaca.trading.requests import TakeProfit, StopLoss
+        # attach bracket legs
+        fields["order_class"] = OrderClass.BRACKET
         if take_profit is not None:
-            req.take_profit = TakeProfit(limit_price=str(take_profit))
+            fields["take_profit"] = TakeProfitRequest(limit_price=str(take_profit))
         if stop_loss is not None:
-            req.stop_loss = StopLoss(stop_price=str(stop_loss))
+            fields["stop_loss"] = StopLossRequest(stop_price=str(stop_loss))
+    return LimitOrderRequest(**fields)
 
-    return submit_order_safe(trading_client.submit_order, order_data=req, client_order_id=client_order_id)
+def place_limit_order(symbol, qty, side, limit_price, time_in_force="day", order_class=None, take_profit=None, stop_loss=None, client_order_id=None):
+    """
+    Creates a Limit (or bracket) order using alpaca-py TradingClient. Uses retry wrapper.
+    """
+    trading_client = _trading_client()
+    req = _limit_order_request(symbol, qty, side, limit_price, time_in_force=time_in_force, order_class=order_class,
+                               take_profit=take_profit, stop_loss=stop_loss, client_order_id=client_order_id)
+    return submit_order_safe(trading_client.submit_order, order_data=req)
 
 def cancel_order(order_id):
-    if trading_client is None:
-        return
+    trading_client = _trading_client()
     try:
-        trading_client.cancel_order(order_id)
+        trading_client.cancel_order_by_id(order_id)
     except Exception as e:
-        logger.exception("Cancel order error: %s", e)
+        logger.warning("Cancel order error: %s", e)
+
+# Orders in a terminal state never change again, so they are cached until evicted;
+# live orders are cached for ORDER_TTL_SECONDS to absorb tight polling loops.
+ORDER_TTL_SECONDS = 1.0
+ORDER_CACHE_MAXSIZE = 1024
+TERMINAL_ORDER_STATUSES = frozenset(s.value for s in (OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED,
+                                                      OrderStatus.EXPIRED))
+_order_cache = OrderedDict()  # order id -> (order, fetched_at, terminal)
+_order_lock = threading.Lock()
 
 def get_order(order_id):
-    if trading_client is None:
-        return None
+    key = str(order_id)
+    with _order_lock:
+        hit = _order_cache.get(key)
+    if hit is not None:
+        order, fetched_at, terminal = hit
+        if terminal or time.monotonic() - fetched_at < ORDER_TTL_SECONDS:
+            return order
+    trading_client = _trading_client()
     try:
-        return trading_client.get_order_by_id(order_id)
+        order = trading_client.get_order_by_id(order_id)
     except Exception as e:
-        logger.exception("Get order error: %s", e)
+        logger.warning("Get order error: %s", e)
         return None
+    terminal = getattr(order.status, "value", order.status) in TERMINAL_ORDER_STATUSES
+    with _order_lock:
+        _order_cache[key] = (order, time.monotonic(), terminal)
+        _order_cache.move_to_end(key)
+        while len(_order_cache) > ORDER_CACHE_MAXSIZE:
+            _order_cache.popitem(last=False)
+    return order
+
+# Async variants. alpaca-py is synchronous, so each call runs on a worker thread (requests
+# releases the GIL while waiting on the socket); independent requests awaited together via
+# asyncio.gather overlap their round-trips.
+_request_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="alpaca")
+
+async def _run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_request_executor, functools.partial(func, *args, **kwargs))
+
+async def list_positions_async():
+    return await _run_blocking(list_positions)
+
+async def get_latest_quote_async(symbol: str):
+    return await _run_blocking(get_latest_quote, symbol)
+
+async def get_latest_quotes_async(symbols):
+    return await _run_blocking(get_latest_quotes, symbols)
+
+async def place_limit_order_async(symbol, qty, side, limit_price, time_in_force="day", order_class=None, take_profit=None, stop_loss=None, client_order_id=None):
+    return await _run_blocking(place_limit_order, symbol, qty, side, limit_price, time_in_force=time_in_force,
+                               order_class=order_class, take_profit=take_profit, stop_loss=stop_loss,
+                               client_order_id=client_order_id)
+
+async def place_orders_bulk(order_specs):
+    """
+    Submit a basket of limit/bracket orders at once. Each spec is a dict of place_limit_order
+    keyword arguments. All requests are built before any is sent, then submitted concurrently
+    so the orders reach Alpaca within one round-trip of each other.
+    Returns one entry per spec, in order: the Alpaca order, or the exception it raised.
+    """
+    trading_client = _trading_client()
+    reqs = []
+    for spec in order_specs:
+        try:
+            reqs.append(_limit_order_request(**spec))
+        except Exception as e:
+            reqs.append(e)
+
+    async def _submit(req):
+        if isinstance(req, Exception):
+            raise req
+        return await _run_blocking(submit_order_safe, trading_client.submit_order, order_data=req)
+
+    return await asyncio.gather(*[_submit(req) for req in reqs], return_exceptions=True)
+
+async def cancel_order_async(order_id):
+    return await _run_blocking(cancel_order, order_id)
+
+async def get_order_async(order_id):
+    return await _run_blocking(get_order, order_id)
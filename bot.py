@@ -1,56 +1,66 @@
 # bot.py
 import argparse
+import asyncio
 import logging
 import time
 from utils import setup_logging
-from alpaca_client import get_account
-from strategy import execute_scan
+from strategy import execute_scan_async
 from risk_manager import _load_config
 
+try:
+    import uvloop
+except ImportError:  # optional: faster event loop (not available on Windows)
+    uvloop = None
+
 setup_logging("INFO")
 logger = logging.getLogger("bot")
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--once", action="store_true", help="Run one scan and exit (useful for GitHub Action invocation).")
-    args = parser.parse_args()
-
+async def main_async(once=False):
     try:
         config = _load_config()
     except Exception as e:
         logger.exception("Could not load config.json; exiting. Fix config.json syntax then retry. Error: %s", e)
         return
 
-    symbols = config.get("SYMBOLS", [])
+    symbols = tuple(config.get("SYMBOLS", ()))
     interval = config.get("SCAN_INTERVAL_SECONDS", 300)
     logger.info("Starting bot in %s mode. Scanning %d symbols every %s seconds", config.get("MODE", "PAPER"), len(symbols), interval)
 
-    if args.once:
+    if once:
         try:
-            acc = None
-            try:
-                acc = get_account()
-            except Exception as e:
-                logger.debug("Failed to fetch account; continuing with scan. Error: %s", e)
-            res = execute_scan(symbols, config, acc)
+            res = await execute_scan_async(symbols, config, None)
             logger.info("One-shot scan results: %s", res)
             return
         except Exception as e:
             logger.exception("One-shot execution failed: %s", e)
             return
 
-    # Long-running loop (for local runs)
+    # Long-running loop (for local runs). Scans start on a fixed cadence: the time spent
+    # scanning is subtracted from the sleep, and ticks missed by a slow scan are skipped.
+    next_tick = time.monotonic()
     while True:
         try:
-            acc = None
-            try:
-                acc = get_account()
-            except Exception:
-                logger.debug("Account fetch failed; proceeding with scan.")
-            execute_scan(symbols, config, acc)
+            config = _load_config()
+            symbols = tuple(config.get("SYMBOLS", ()))
+            interval = config.get("SCAN_INTERVAL_SECONDS", 300)
+        except Exception as e:
+            logger.warning("Could not reload config.json; keeping previous settings. Error: %s", e)
+        try:
+            await execute_scan_async(symbols, config, None)
         except Exception as e:
             logger.exception("Main loop error: %s", e)
-        time.sleep(interval)
+        next_tick += interval
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick = now
+        await asyncio.sleep(next_tick - now)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", action="store_true", help="Run one scan and exit (useful for GitHub Action invocation).")
+    args = parser.parse_args()
+    run = uvloop.run if uvloop is not None else asyncio.run
+    run(main_async(once=args.once))
 
 if __name__ == "__main__":
     main()
@@ -1,69 +1,106 @@
 # order_manager.py
+import itertools
 import logging
-import uuid
-from decimal import Decimal
-from alpaca_client import place_limit_order, get_latest_quote
+import os
+from alpaca_client import place_limit_order, get_latest_quote, place_orders_bulk
 from utils import now_ts
 
 logger = logging.getLogger(__name__)
 
+# client_order_id suffix: pid (fixed per process) plus a per-process sequence number.
+_PID = os.getpid()
+_coid_counter = itertools.count()
+
+def _round_price(price):
+    """
+    Round to a valid price increment: whole cents at or above $1, 4 decimals below
+    (Alpaca rejects sub-penny limit prices on shares priced $1 and up).
+    """
+    return round(price, 2 if price >= 1 else 4)
+
 def marketable_limit_price(side, last_trade_price, slippage_pct, limit_offset_ticks):
     """
     Compute a marketable limit price near last_trade_price that biases toward being filled
     but protects from worst-case slippage.
     """
-    price = Decimal(str(last_trade_price))
-    offset = Decimal(str(slippage_pct))
-    tick = Decimal(str(limit_offset_ticks))
-    if side.lower() == "buy":
-        target = price * (1 + offset) + tick
-    else:
-        target = price * (1 - offset) - tick
-    return float(round(target, 4))
+    sign = 1.0 if side.lower() == "buy" else -1.0
+    return _round_price(last_trade_price * (1.0 + sign * slippage_pct) + sign * limit_offset_ticks)
 
-def submit_scalp_order(symbol, qty, side, target_pct, slippage_pct, bracket=True, limit_offset_ticks=0.0):
+def quote_price(quote):
     """
-    Submit a limit (marketable) or bracket order with TP/SL.
-    Returns Alpaca order object or None.
+    Reference price of a quote: last trade if present, else ask, else bid (None if none is set).
+    Used both to size an entry and to price its limit order.
+    """
+    last = getattr(quote, "last", None)
+    if last and getattr(last, "price", None):
+        return last.price
+    return getattr(quote, "ask_price", None) or getattr(quote, "bid_price", None)
+
+def build_scalp_order(symbol, qty, side, target_pct, slippage_pct, limit_offset_ticks, quote):
+    """
+    Build the place_limit_order arguments for a scalp bracket order from a quote.
+    Returns a dict of keyword arguments or None if the quote has no usable price.
     """
-    quote = get_latest_quote(symbol)
     if not quote:
         logger.warning("No quote available for %s", symbol)
         return None
 
-    # obtain price (last trade preferred)
-    last_price = None
-    if hasattr(quote, 'last') and quote.last and getattr(quote.last, "price", None):
-        last_price = quote.last.price
-    else:
-        last_price = getattr(quote, "ask_price", None) or getattr(quote, "bid_price", None)
-
+    last_price = quote_price(quote)
     if not last_price:
         logger.warning("Quote has no usable price for %s", symbol)
         return None
 
     limit_price = marketable_limit_price(side, last_price, slippage_pct, limit_offset_ticks)
-    client_order_id = f"scalp-{symbol}-{now_ts()}-{uuid.uuid4().hex[:6]}"
+    client_order_id = f"scalp-{symbol}-{now_ts()}-{_PID}-{next(_coid_counter):06x}"
+
+    # Take profit target_pct in the trade's favour, stop loss twice that against it.
+    sign = 1.0 if side.lower() == "buy" else -1.0
+    take = _round_price(limit_price * (1.0 + sign * target_pct))
+    stop = _round_price(limit_price * (1.0 - sign * target_pct * 2))
+    return {"symbol": symbol, "qty": qty, "side": side.lower(), "limit_price": limit_price, "order_class": "bracket",
+            "take_profit": take, "stop_loss": stop, "client_order_id": client_order_id}
 
-    if side.lower() == "buy":
-        take = limit_price * (1 + target_pct)
-        stop = limit_price * (1 - (target_pct * 2))
-        try:
-            order = place_limit_order(symbol, qty, "buy", limit_price, order_class="bracket",
-                                      take_profit=take, stop_loss=stop, client_order_id=client_order_id)
-            logger.info("Placed BUY bracket order %s qty=%s limit=%s TP=%s SL=%s", symbol, qty, limit_price, take, stop)
-            return order
-        except Exception as e:
-            logger.exception("Failed to place buy order for %s: %s", symbol, e)
-            return None
-    else:
-        take = limit_price * (1 - target_pct)
-        stop = limit_price * (1 + (target_pct * 2))
-        try:
-            order = place_limit_order(symbol, qty, "sell", limit_price, order_class="bracket",
-                                      take_profit=take, stop_loss=stop, client_order_id=client_order_id)
-            logger.info("Placed SELL bracket order %s qty=%s limit=%s TP=%s SL=%s", symbol, qty, limit_price, take, stop)
-            return order
-        except Exception as e:
-            logger.exception("Failed to place sell order for %s: %s", symbol, e)
-            return None
+def _log_placed(params):
+    logger.info("Placed %s bracket order %s qty=%s limit=%s TP=%s SL=%s", params["side"].upper(), params["symbol"], params["qty"],
+                params["limit_price"], params["take_profit"], params["stop_loss"])
+
+def submit_scalp_order(symbol, qty, side, target_pct, slippage_pct, bracket=True, limit_offset_ticks=0.0, quote=None):
+    """
+    Submit a limit (marketable) or bracket order with TP/SL.
+    Prices off the given quote (e.g. the one the signal was computed from), fetching one if omitted.
+    Returns Alpaca order object or None.
+    """
+    if quote is None:
+        quote = get_latest_quote(symbol)
+    params = build_scalp_order(symbol, qty, side, target_pct, slippage_pct, limit_offset_ticks, quote)
+    if params is None:
+        return None
+    try:
+        order = place_limit_order(**params)
+        _log_placed(params)
+        return order
+    except Exception as e:
+        logger.exception("Failed to place %s order for %s: %s", params["side"], symbol, e)
+        return None
+
+async def submit_scalp_orders(order_specs):
+    """
+    Submit orders built by build_scalp_order as one concurrent basket.
+    Returns the Alpaca order for each spec, or None where submission failed.
+    """
+    if not order_specs:
+        return []
+    try:
+        submitted = await place_orders_bulk(order_specs)
+    except Exception as e:
+        logger.exception("Failed to place %d orders: %s", len(order_specs), e)
+        return [None] * len(order_specs)
+    orders = []
+    for params, order in zip(order_specs, submitted):
+        if isinstance(order, Exception):
+            logger.error("Failed to place %s order for %s: %s", params["side"], params["symbol"], order, exc_info=order)
+            orders.append(None)
+        else:
+            _log_placed(params)
+            orders.append(order)
+    return orders
@@ -2,14 +2,14 @@
 import json
 import logging
 from alpaca_client import list_positions, get_account
+from utils import load_config
 
 logger = logging.getLogger(__name__)
 CONFIG_PATH = "config.json"
 
 def _load_config():
     try:
-        with open(CONFIG_PATH, "r") as f:
-            return json.load(f)
+        return load_config(CONFIG_PATH)
     except json.JSONDecodeError as e:
         logger.exception("config.json is not valid JSON: %s", e)
         raise
@@ -20,27 +20,33 @@ def _load_config():
         logger.exception("Unexpected error loading config.json: %s", e)
         raise
 
-def can_enter_position(symbol, config=None):
+def held_symbols(positions):
+    """Set of symbols with an open position, for O(1) membership checks."""
+    return frozenset(getattr(p, "symbol", None) for p in positions)
+
+def can_enter_position(symbol, config=None, pending=0, held=None):
+    """
+    pending: entries already approved in the current scan but not yet visible as positions.
+    held: held_symbols() of an open positions snapshot; fetched from Alpaca if omitted.
+    """
     if config is None:
         config = _load_config()
 
-    try:
-        positions = list_positions()
-    except Exception as e:
-        logger.warning("Could not list positions (assuming zero): %s", e)
-        positions = []
-
-    if len(positions) >= config.get("MAX_SIMULTANEOUS_POSITIONS", 6):
-        logger.debug("Max simultaneous positions reached: %d >= %d", len(positions), config.get("MAX_SIMULTANEOUS_POSITIONS", 6))
+    if held is None:
+        try:
+            held = held_symbols(list_positions())
+        except Exception as e:
+            logger.warning("Could not list positions (assuming zero): %s", e)
+            held = frozenset()
+
+    max_positions = config.get("MAX_SIMULTANEOUS_POSITIONS", 6)
+    if len(held) + pending >= max_positions:
+        logger.debug("Max simultaneous positions reached: %d >= %d", len(held) + pending, max_positions)
         return False
 
-    for p in positions:
-        try:
-            if getattr(p, "symbol", None) == symbol:
-                logger.debug("Existing position detected in %s, skipping.", symbol)
-                return False
-        except Exception:
-            continue
+    if symbol in held:
+        logger.debug("Existing position detected in %s, skipping.", symbol)
+        return False
 
     # Basic daily-loss/account checks could go here. For now, allow entry.
     return True
@@ -1,83 +1,137 @@
 # strategy.py
+import asyncio
 import logging
-from alpaca_client import get_latest_quote
-from order_manager import submit_scalp_order
-from risk_manager import can_enter_position, get_position_size_usd
-from decimal import Decimal
+from alpaca_client import get_latest_quote, get_latest_quotes_async, list_positions_async
+from order_manager import build_scalp_order, quote_price, submit_scalp_orders
+from risk_manager import can_enter_position, get_position_size_usd, held_symbols
 
 logger = logging.getLogger(__name__)
 
-def compute_signal(symbol):
-    """
-    Lightweight micro-scalp signal based on last trade vs bid/ask skew.
-    Returns: (signal_str or None, confidence 0..1)
-    """
-    quote = get_latest_quote(symbol)
-    if not quote:
-        return None, 0.0
-
+def _quote_prices(quote):
+    """(last, ask, bid) from a quote; ask/bid fall back to last, missing values are None."""
     last = None
     if hasattr(quote, 'last') and quote.last and getattr(quote.last, 'price', None) is not None:
         last = quote.last.price
-
     ask = getattr(quote, 'ask_price', None) or last
     bid = getattr(quote, 'bid_price', None) or last
+    return last, ask, bid
 
-    if last is None or ask is None or bid is None:
-        return None, 0.0
+def compute_signals(symbols, quotes):
+    """
+    Micro-scalp signals for a batch of symbols from their quotes ({symbol: Quote}).
+    Signal is based on last trade vs bid/ask skew.
+    Returns: {symbol: (signal_str or None, confidence 0..1)}
+    """
+    signals = {}
+    for sym in symbols:
+        last, ask, bid = _quote_prices(quotes.get(sym))
+        if last is None or ask is None or bid is None:
+            signals[sym] = (None, 0.0)
+            continue
+        spread = ask - bid
+        if spread <= 0:
+            spread = 1e-9
+        rel = (last - bid) / spread
+        confidence = min(max(abs(rel - 0.5) * 2.0, 0.0), 1.0)
+        if rel > 0.6:
+            signals[sym] = ("buy", confidence)
+        elif rel < 0.4:
+            signals[sym] = ("sell", confidence)
+        else:
+            signals[sym] = (None, 0.0)
+    return signals
 
-    try:
-        last_d = Decimal(str(last))
-        ask_d = Decimal(str(ask))
-        bid_d = Decimal(str(bid))
-        spread = (ask_d - bid_d) if (ask_d - bid_d) > 0 else Decimal("1e-9")
-        rel = float((last_d - bid_d) / spread)
-    except Exception:
+def compute_signal(symbol, quote=None):
+    """
+    Signal for a single symbol (see compute_signals).
+    Uses the given quote if provided, otherwise fetches the latest one.
+    Returns: (signal_str or None, confidence 0..1)
+    """
+    if quote is None:
+        quote = get_latest_quote(symbol)
+    if not quote:
         return None, 0.0
+    return compute_signals([symbol], {symbol: quote})[symbol]
 
-    confidence = max(0.0, min(1.0, abs(rel - 0.5) * 2.0))
-    if rel > 0.6:
-        return "buy", confidence
-    if rel < 0.4:
-        return "sell", confidence
-    return None, 0.0
+def _build_entry(sym, sig, quote, price, size_usd, target_pct, slippage, limit_offset):
+    """
+    Size an approved (affordable) entry at price. Returns (qty, order spec) or None.
+    """
+    qty = int(size_usd // price)
+    side = "buy" if sig == "buy" else "sell"
 
-def execute_scan(symbols, config, account):
-    results = []
-    for sym in symbols:
-        try:
-            sig, conf = compute_signal(sym)
-            if not sig:
-                continue
+    spec = build_scalp_order(sym, qty, side, target_pct, slippage, limit_offset, quote)
+    if spec is None:
+        return None
+    return qty, spec
 
-            if not can_enter_position(sym, config):
-                logger.debug("Risk manager blocked entry for %s", sym)
-                continue
+async def execute_scan_async(symbols, config, account):
+    """
+    Scan symbols: fetch all quotes (one request) together with open positions, compute signals for
+    the symbols not already held, approve entries serially (price, affordability and risk checks, so
+    each approval counts toward the position limit), then build every approved order and submit
+    them together as one basket.
+    """
+    # Quotes and open positions are fetched once per scan and shared by every symbol.
+    quotes, positions = await asyncio.gather(get_latest_quotes_async(symbols), list_positions_async())
+    held = held_symbols(positions)
 
-            size_usd = get_position_size_usd(sym, config)
-            quote = get_latest_quote(sym)
-            if not quote:
+    # Held symbols are exited by their bracket legs and would be rejected by the risk check,
+    # so only the rest need signals; at the position limit nothing can be entered at all.
+    if len(held) >= config.get("MAX_SIMULTANEOUS_POSITIONS", 6):
+        logger.debug("Max simultaneous positions reached (%d); skipping signal computation.", len(held))
+        return []
+    candidates = [sym for sym in symbols if sym not in held]
+    signals = compute_signals(candidates, quotes)
+
+    approved = []
+    for sym in candidates:
+        try:
+            if not quotes.get(sym):
                 logger.debug("No quote for %s", sym)
                 continue
-
-            price = None
-            if hasattr(quote, 'last') and quote.last and getattr(quote.last, 'price', None) is not None:
-                price = quote.last.price
-            else:
-                price = getattr(quote, 'ask_price', None) or getattr(quote, 'bid_price', None)
-
+            sig, conf = signals[sym]
+            if not sig:
+                continue
+            # Unpriceable or unaffordable symbols are dropped before the risk check so they
+            # never take up a position slot that a tradeable symbol could use.
+            price = quote_price(quotes[sym])
             if not price or price <= 0:
                 logger.debug("Invalid price for %s, skipping", sym)
                 continue
+            size_usd = get_position_size_usd(sym, config)
+            if price > size_usd:
+                logger.debug("One share of %s (%s) exceeds position size %s, skipping", sym, price, size_usd)
+                continue
+            if not can_enter_position(sym, config, pending=len(approved), held=held):
+                logger.debug("Risk manager blocked entry for %s", sym)
+                continue
+        except Exception as e:
+            logger.exception("Error scanning %s: %s", sym, e)
+            continue
+        approved.append((sym, sig, conf, price, size_usd))
 
-            qty = max(1, int(size_usd / price))
-            target_pct = config.get("TRADE_TARGET_PER_TRADE", 0.005)
-            slippage = config.get("SLIPPAGE_PCT", 0.002)
-            limit_offset = config.get("LIMIT_OFFSET_TICKS", 0.01)
-            side = "buy" if sig == "buy" else "sell"
+    # Order parameters are constant for the scan; read them once rather than per symbol.
+    target_pct = config.get("TRADE_TARGET_PER_TRADE", 0.005)
+    slippage = config.get("SLIPPAGE_PCT", 0.002)
+    limit_offset = config.get("LIMIT_OFFSET_TICKS", 0.01)
 
-            order = submit_scalp_order(sym, qty, side, target_pct, slippage, bracket=True, limit_offset_ticks=limit_offset)
-            results.append({"symbol": sym, "signal": sig, "confidence": conf, "qty": qty, "order": str(order)})
+    results, specs = [], []
+    for sym, sig, conf, price, size_usd in approved:
+        try:
+            entry = _build_entry(sym, sig, quotes[sym], price, size_usd, target_pct, slippage, limit_offset)
         except Exception as e:
             logger.exception("Error scanning %s: %s", sym, e)
+            continue
+        if entry is None:
+            continue
+        qty, spec = entry
+        results.append({"symbol": sym, "signal": sig, "confidence": conf, "qty": qty})
+        specs.append(spec)
+
+    for res, order in zip(results, await submit_scalp_orders(specs)):
+        res["order"] = str(order)
     return results
+
+def execute_scan(symbols, config, account):
+    return asyncio.run(execute_scan_async(symbols, config, account))
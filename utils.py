@@ -1,10 +1,35 @@
 # utils.py
+import json
 import logging
+import os
 import time
 
+try:
+    import orjson
+except ImportError:  # optional: faster JSON parsing, stdlib json is used otherwise
+    orjson = None
+
 def setup_logging(level="INFO"):
     logging.basicConfig(format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
                         level=getattr(logging, level.upper(), logging.INFO))
 
 def now_ts():
-    return int(time.time())
+    return time.time_ns() // 1_000_000_000
+
+_config_cache = {}  # absolute path -> (mtime_ns, parsed config)
+
+def load_config(path="config.json"):
+    """
+    Load a JSON config file. The parsed result is cached and only re-read when the
+    file's mtime changes, so calling this every scan costs a single stat().
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    hit = _config_cache.get(path)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    with open(path, "rb") as f:
+        raw = f.read()
+    config = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    _config_cache[path] = (mtime, config)
+    return config